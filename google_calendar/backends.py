@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class UserMetaDataBackend(ModelBackend):
+    """
+    Authentication backend which loads UserMetaData along with the user, as
+    it is accessed by the reports on every request
+    """
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related(
+                'cal_meta_data'
+            ).get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-15 01:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('google_calendar', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usermetadata',
+            name='synced_at',
+            field=models.DateTimeField(blank=True, help_text='Datetime when events were last synced from calendar API', null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-15 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('google_calendar', '0002_usermetadata_synced_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendee',
+            index=models.Index(fields=['event', 'response', 'email'], name='google_cale_event_i_f2745c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['user', 'is_attendee', 'start_datetime'], name='google_cale_user_id_ad9018_idx'),
+        ),
+    ]
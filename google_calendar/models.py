@@ -55,6 +55,11 @@ class Event(models.Model):
 
     class Meta:
         unique_together = ('user', 'event_id')
+        indexes = [
+            # Used by the reports which filter attended events of an user
+            # over time
+            models.Index(fields=['user', 'is_attendee', 'start_datetime']),
+        ]
 
     def __str__(self):
         return '{}-{}'.format(self.pk, self.summary)
@@ -80,6 +85,10 @@ class Attendee(models.Model):
 
     class Meta:
         unique_together = ('event', 'email')
+        indexes = [
+            # Used by the reports which count accepted attendees by email
+            models.Index(fields=['event', 'response', 'email']),
+        ]
 
     def __str__(self):
         return '{}-{}()'.format(self.pk, self.email, self.response)
@@ -119,4 +128,10 @@ class UserMetaData(models.Model):
         max_length=64,
         blank=True,
         help_text='Timezone of the user'
+    )
+
+    synced_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Datetime when events were last synced from calendar API'
     )
\ No newline at end of file
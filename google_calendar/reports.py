@@ -0,0 +1,345 @@
+from datetime import datetime
+from functools import lru_cache
+
+import pytz
+from dateutil.relativedelta import relativedelta
+from django.db.models import ExpressionWrapper, F, DurationField, Sum, Count, \
+    Min
+from django.db.models.functions import Extract
+from django.utils.functional import cached_property
+
+from google_calendar import ACCEPTED
+from google_calendar.models import Event, Attendee
+
+
+@lru_cache(maxsize=512)
+def get_time_zone(name):
+    """
+    Returns tzinfo for a time zone name. Lookups are cached per process
+    :param name: Name of the time zone i.e. `Asia/Kolkata`
+    :return: tzinfo, defaults to UTC when name is empty
+    """
+    if name:
+        return pytz.timezone(name)
+    return pytz.utc
+
+
+def format_duration(seconds):
+    """
+    Renders duration in the same format as pandas' Timedelta
+    i.e. 115200 --> `1 days 08:00:00`
+    :param seconds: Duration in seconds
+    :return: str
+    """
+    days, seconds = divmod(seconds, 24 * 60 * 60)
+    hours, seconds = divmod(seconds, 60 * 60)
+    minutes, seconds = divmod(seconds, 60)
+    return f'{days} days {hours:02}:{minutes:02}:{seconds:02}'
+
+
+class ReportCalculator(object):
+    """
+    Calculates several reports from Events and Attendee models based on below
+    metrics
+    - Number of events
+    - Time spent in events
+    - Attendee
+    """
+    def __init__(self, user, **kwargs):
+        """
+        :param user: User instance
+        """
+        self.user = user
+
+        self.time_zone = get_time_zone(user.cal_meta_data.time_zone)
+
+        # Evaluating current time once so that both querysets share the same
+        # cut-off
+        self._now = datetime.now(pytz.utc)
+
+        # Start of the month 2 months back from current month of the user
+        self.last_3_month_date = self._now.astimezone(
+            self.time_zone
+        ) - relativedelta(
+            months=2, day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+
+        # Filters on Event which are shared by both querysets
+        base_filters = dict(
+            user=user,
+            is_attendee=True,
+            start_datetime__lte=self._now,
+            **kwargs
+        )
+
+        self.event_queryset = Event.objects.filter(**base_filters)
+        self.attendee_queryset = Attendee.objects.filter(
+            response=ACCEPTED,
+            **{'event__' + key: value for key, value in base_filters.items()}
+        )
+
+    @cached_property
+    def _monthly_events(self):
+        """
+        Aggregates events over months
+        :return: tuple of dict with year, month, time_spent(in seconds),
+        number_of_events and start(of the first event) ordered by year and
+        month
+        """
+        # Rows are shared by all the reports, so they are materialized once
+        # into a tuple, which reports only read from while building their own
+        # small records
+        records = tuple(
+            self.event_queryset.annotate(
+                time_spent=ExpressionWrapper(
+                    F('end_datetime') - F('start_datetime'),
+                    output_field=DurationField()
+                )
+            ).values(
+                # Extracting year and month while localizing them
+                year=Extract('start_datetime', 'year', tzinfo=self.time_zone),
+                month=Extract('start_datetime', 'month', tzinfo=self.time_zone),
+            ).annotate(
+                time_spent=Sum('time_spent'),
+                number_of_events=Count('*'),
+                start=Min('start_datetime')
+            ).order_by(
+                'year',
+                'month'
+            ).iterator()
+        )
+        # Keeping time spent as whole seconds so that rest of the calculations
+        # are plain integer arithmetic
+        for record in records:
+            record['time_spent'] = int(record['time_spent'].total_seconds())
+        return records
+
+    @cached_property
+    def _number_of_weeks(self):
+        """
+        Calculates number of week from first event till current date
+        :return:
+        """
+        if self._monthly_events:
+            # First event is the earliest start of the first month, which
+            # spares a separate aggregation query
+            start = self._monthly_events[0]['start']
+
+            # Days from first events
+            total_days = (self._now - start).days
+            return round(total_days / 7)
+        else:
+            return 0
+
+    def compute(self):
+        """
+        Calculates all the reports which share aggregated events of this
+        instance, so the aggregation runs only once
+        :return: dict
+        """
+        result = {}
+        result['number_of_events'] = self.number_of_events()
+        result['time_spent'] = self.time_spent()
+        if self._monthly_events:
+            result['attendee'] = self.attendee()
+        else:
+            # Without any attended event there can not be any attendee, so
+            # attendees are not queried
+            result['attendee'] = {'top_attendees': []}
+        return result
+
+    def number_of_events(self):
+        """
+        Calculates dict for several stats for a `number of events` metrics
+        - Total
+        - Last 3 months distribution(It may have less than 3 if user have not
+        attended any event in whole month)
+        - Months with most number of events
+        - Months with least number of events
+        - Weekly average
+        :return: dict
+        """
+        if not self._monthly_events:
+            # User has not attended any event
+            return self._empty_report(0)
+
+        # Calculating months for most and least number of events
+        least_count, most_count = self._calculate_months_with_min_max(
+            'number_of_events'
+        )
+
+        # Calculating total and number of events for last 3 months
+        total, last_3_months = self._calculate_total_and_last_3_months(
+            'number_of_events'
+        )
+
+        # Calculating weekly average
+        week_count = self._number_of_weeks
+        if week_count:
+            weekly_average = round(total / week_count, 2)
+        else:
+            weekly_average = 0
+
+        # Structuring final report dict
+        result = {}
+        result['total'] = total
+        result['last_3_months'] = last_3_months
+        result['most'] = most_count
+        result['least'] = least_count
+        result['weekly_average'] = weekly_average
+        return result
+
+    def time_spent(self):
+        """
+        Calculates dict for several stats for a `time_spent` metrics
+        - Total time spent
+        - Last 3 months distribution
+        - Months in which user spent most time
+        - Months in which user spent least time
+        - Weekly average
+        :return: dict
+        """
+        if not self._monthly_events:
+            # User has not attended any event
+            return self._empty_report(format_duration(0))
+
+        # Calculating months for most and least amount of time spent
+        least_time_spent, most_time_spent = self._calculate_months_with_min_max(
+            'time_spent'
+        )
+
+        # Calculating total and time spent for past 3 months
+        total, last_3_months = self._calculate_total_and_last_3_months(
+            'time_spent'
+        )
+
+        # Casting seconds to readable strings
+        for record in least_time_spent + most_time_spent + last_3_months:
+            record['value'] = format_duration(record['value'])
+
+        # Calculating weekly average
+        week_count = self._number_of_weeks
+        if week_count:
+            weekly_average = format_duration(round(total / week_count))
+        else:
+            weekly_average = format_duration(0)
+
+        # Structuring final report dict
+        result = {}
+        result['total'] = format_duration(total)
+        result['last_3_months'] = last_3_months
+        result['most'] = most_time_spent
+        result['least'] = least_time_spent
+        result['weekly_average'] = weekly_average
+        return result
+
+    @staticmethod
+    def _empty_report(zero_value):
+        """
+        Creates report dict for a metrics when there are no events
+        :param zero_value: Value used for total and weekly average
+        :return: dict
+        """
+        return {
+            'total': zero_value,
+            'last_3_months': [],
+            'most': [],
+            'least': [],
+            'weekly_average': zero_value
+        }
+
+    @staticmethod
+    def _month_record(record, metrics):
+        """
+        Creates a report record for a month of the aggregated events
+        :param record: dict from `_monthly_events`
+        :param metrics: time_spent|number_of_events
+        :return: dict with month and value
+        """
+        # Combining year and month
+        # i.e. 2018 + 1 --> `2018-01`
+        return {
+            'month': f"{record['year']}-{record['month']:02}",
+            'value': record[metrics]
+        }
+
+    def _calculate_months_with_min_max(self, metrics):
+        """
+        Calculates months with most and least count for a given metrics
+        :param metrics: time_spent|number_of_events
+        :return: list of dict for least count, list of dict for most count
+        """
+        # Retrieving min and max records for a metrics in a single pass. In
+        # case of tie, it will pull all qualifying records
+        least_records, most_records = [], []
+        for record in self._monthly_events:
+            value = record[metrics]
+            if not least_records or value < least_records[0][metrics]:
+                least_records = [record]
+            elif value == least_records[0][metrics]:
+                least_records.append(record)
+            if not most_records or value > most_records[0][metrics]:
+                most_records = [record]
+            elif value == most_records[0][metrics]:
+                most_records.append(record)
+
+        return (
+            [self._month_record(record, metrics) for record in least_records],
+            [self._month_record(record, metrics) for record in most_records]
+        )
+
+    def _calculate_total_and_last_3_months(self, metrics):
+        """
+        Calculates total and records for last 3 months for given metrics in a
+        single pass over the monthly events
+        :param metrics: time_spent|number_of_events
+        :return: total, list of dict for last 3 months
+        """
+        # Comparing year and month together so that months of the next
+        # year are considered correctly i.e. 2020-01 when cut-off is 2019-11
+        start_month = (self.last_3_month_date.year,
+                       self.last_3_month_date.month)
+
+        total = 0
+        last_3_months = []
+        for record in self._monthly_events:
+            total += record[metrics]
+
+            # Retrieving records for past 3 months
+            if (record['year'], record['month']) >= start_month:
+                last_3_months.append(self._month_record(record, metrics))
+        return total, last_3_months
+
+    def attendee(self):
+        """
+        Calculates dict containing several stats for attendee metrics
+        - Top 3 people with whom user has attended the events most. But if there
+        is a tie, then it may have more than 3 people
+        :return: dict
+        """
+        attendees_counts = self.attendee_queryset.values(
+            'email'
+        ).annotate(
+            count=Count('*')
+        ).order_by(
+            '-count',
+            'email'
+        )
+
+        # Pulling one extra record to detect a tie for the 3rd place, in which
+        # case all the qualifying records are pulled
+        top_attendees = list(attendees_counts[:4])
+        if len(top_attendees) > 3 and \
+                top_attendees[3]['count'] == top_attendees[2]['count']:
+            top_attendees = list(attendees_counts.filter(
+                count__gte=top_attendees[2]['count']
+            ))
+        else:
+            top_attendees = top_attendees[:3]
+
+        result = {}
+        result['top_attendees'] = [
+            {'name': record['email'], 'number_of_events': record['count']}
+            for record in top_attendees
+        ]
+        return result
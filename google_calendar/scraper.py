@@ -1,25 +1,105 @@
-import pytz
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time
+from functools import lru_cache
+
 from dateutil import parser
 from django.conf import settings
 from django.db import transaction
+from django.utils import dateparse, timezone
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+from googleapiclient.discovery_cache.base import Cache
+from googleapiclient.http import build_http
 
 from google_calendar import API_NAME, API_VERSION, ACCEPTED, SCOPES
 from google_calendar.models import Event, Attendee
+from google_calendar.reports import get_time_zone
 
 
-def create_event(record, user):
+class DiscoveryDocumentCache(Cache):
     """
-    Creates Event and its related data with the data received from API
+    Caches discovery documents of Google APIs in memory, so that they are
+    fetched once per process instead of on every build()
+    """
+    def __init__(self):
+        self._documents = {}
+
+    def get(self, url):
+        return self._documents.get(url)
+
+    def set(self, url, content):
+        self._documents[url] = content
+
+
+discovery_cache = DiscoveryDocumentCache()
+
+
+@lru_cache(maxsize=None)
+def get_client_config():
+    """
+    Loads credentials of Google client app from `GOOGLE_CRED_PATH`. File is
+    read once per process when it is first needed
+    :return: dict with client_id, client_secret, token_uri etc.
+    """
+    with open(settings.GOOGLE_CRED_PATH) as fp:
+        return json.load(fp)['installed']
+
+
+# Matches upper case letters of a camelCase string
+CAMEL_CASE_PATTERN = re.compile(r'([A-Z])')
+
+
+@lru_cache(maxsize=None)
+def to_snake_case(value):
+    """
+    Converts camelCase to snake_case. Results are cached as it is called with
+    a handful of response statuses for every attendee, so attendees share the
+    same str instances as well
+    :param value: str i.e. `needsAction`
+    :return: str i.e. `needs_action`
+    """
+    return CAMEL_CASE_PATTERN.sub(r'_\1', value).lower()
+
+
+def parse_datetime(value):
+    """
+    Parses datetime received from API. API returns RFC3339 datetimes which
+    are parsed with Django's precompiled pattern, dateutil is used only for
+    any other format
+    :param value: str i.e. `2019-11-15T17:00:00+05:30`
+    :return: datetime
+    """
+    return dateparse.parse_datetime(value) or parser.parse(value)
+
+
+def parse_date(value):
+    """
+    Parses date received from API for all day events
+    :param value: str i.e. `2019-11-15`
+    :return: naive datetime at the start of the day
+    """
+    date = dateparse.parse_date(value)
+    if date:
+        return datetime.combine(date, time())
+    return parser.parse(value)
+
+
+def build_event(record, user, time_zone):
+    """
+    Builds Event and its related data with the data received from API without
+    saving them
     :param record: dict received from API
     :param user: User instance
-    :return: Event instance
+    :param time_zone: tzinfo of the user used for all day events
+    :return: Event instance and list of its Attendee instances, None when the
+    event is cancelled
     """
     # If the event is cancelled, we don't need to store it
     if record['status'] == 'cancelled':
         return
-    time_zone = pytz.timezone(user.cal_meta_data.time_zone or 'UTC')
     event = Event()
     event.user = user
     event.event_id = record['id']
@@ -35,42 +115,88 @@ def create_event(record, user):
 
     start, end = record['start'], record['end']
     if start.get('dateTime'):
-        event.start_datetime = parser.parse(start['dateTime'])
+        event.start_datetime = parse_datetime(start['dateTime'])
     else:
-        event.start_datetime = time_zone.localize(parser.parse(start['date']))
+        event.start_datetime = time_zone.localize(parse_date(start['date']))
     if end.get('dateTime'):
-        event.end_datetime = parser.parse(end['dateTime'])
+        event.end_datetime = parse_datetime(end['dateTime'])
     else:
-        event.end_datetime = time_zone.localize(parser.parse(end['date']))
-    event.created_at = parser.parse(record['created'])
-    event.save()
-    create_attendees(event, record.get('attendees', []))
-    return event
+        event.end_datetime = time_zone.localize(parse_date(end['date']))
+    event.created_at = parse_datetime(record['created'])
+    attendees = build_attendees(event, record.get('attendees', []))
+    return event, attendees
 
 
-def create_attendees(event, attendees_dict):
+def build_attendees(event, attendees_dict):
     """
-    Creates Attendee for an single Event
-    :param event:
-    :param attendees_dict:
-    :return:
+    Builds Attendee for an single Event without saving them. Event is marked as
+    attended if user is one of the attendees and has accepted it
+    :param event: Event instance
+    :param attendees_dict: list of dict received from API
+    :return: list of Attendee instances
     """
     attendees_list = []
     for record in attendees_dict:
         attendee = Attendee()
         attendee.event = event
         attendee.email = record.get('email', '')
-        # Converting camelCase to snake_case
-        attendee.response = ''.join(
-            i if i.islower() else f'_{i.lower()}' for i
-            in record['responseStatus']
-        )
+        attendee.response = to_snake_case(record['responseStatus'])
         if record.get('self') and record.get('responseStatus') == ACCEPTED:
             event.is_attendee = True
         else:
             attendees_list.append(attendee)
-    Attendee.objects.bulk_create(attendees_list)
-    event.save()
+    return attendees_list
+
+
+def create_events(records, user, time_zone=None):
+    """
+    Creates Events and their related data in bulk with the data received from
+    API
+    :param records: list of dict received from API
+    :param user: User instance
+    :param time_zone: tzinfo of the user, resolved from the user when omitted
+    :return: list of Event instances
+    """
+    if time_zone is None:
+        time_zone = get_time_zone(user.cal_meta_data.time_zone)
+    built_events = [
+        built_event for built_event
+        in (build_event(record, user, time_zone) for record in records)
+        if built_event
+    ]
+    events = Event.objects.bulk_create(
+        [event for event, _ in built_events],
+        batch_size=500
+    )
+    if events and events[0].pk is None:
+        # Fetching primary keys for DB backends which can not return them
+        # from bulk insert
+        pks = dict(Event.objects.filter(
+            user=user,
+            event_id__in=[event.event_id for event in events]
+        ).values_list('event_id', 'pk'))
+        for event in events:
+            event.pk = pks[event.event_id]
+
+    attendees = []
+    for event, event_attendees in built_events:
+        for attendee in event_attendees:
+            # Assigning event again so that attendee picks up its primary key
+            attendee.event = event
+        attendees.extend(event_attendees)
+    Attendee.objects.bulk_create(attendees, batch_size=1000)
+    return events
+
+
+def create_event(record, user):
+    """
+    Creates Event and its related data with the data received from API
+    :param record: dict received from API
+    :param user: User instance
+    :return: Event instance
+    """
+    events = create_events([record], user)
+    return events[0] if events else None
 
 
 def store_events(user):
@@ -85,15 +211,17 @@ def store_events(user):
     user_meta_data = user.cal_meta_data
 
     # Connecting to API
+    client_config = get_client_config()
     creds = Credentials(
         token=user_meta_data.access_token,
         refresh_token=user_meta_data.refresh_token,
-        token_uri=settings.GOOGLE_TOKEN_URI,
-        client_id=settings.GOOGLE_CLIENT_ID,
-        client_secret=settings.GOOGLE_CLIENT_SECRET,
+        token_uri=client_config['token_uri'],
+        client_id=client_config['client_id'],
+        client_secret=client_config['client_secret'],
         scopes=SCOPES
     )
-    service = build(API_NAME, API_VERSION, credentials=creds)
+    service = build(API_NAME, API_VERSION, credentials=creds,
+                    cache=discovery_cache)
     events_api = service.events()
     req = events_api.list(
         calendarId='primary',
@@ -101,20 +229,37 @@ def store_events(user):
         maxAttendees=1000
     )
 
-    # Deleting existing events
+    # Resolving time zone once for all the pages
+    time_zone = get_time_zone(user.cal_meta_data.time_zone)
+
+    # Deleting existing events. Attendees are deleted first, so events are
+    # deleted with a single statement instead of collecting them for cascade
     Attendee.objects.filter(event__user=user).delete()
-    Event.objects.filter(user=user).delete()
+    events = Event.objects.filter(user=user)
+    events._raw_delete(events.db)
+
+    # Processing the API response and creating events. Pages are fetched in
+    # a separate thread so that next page is downloaded while events of the
+    # current page are being stored
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # Time zone of the user is fetched alongside the events. It uses its
+        # own connection as http connections can not be shared by threads
+        time_zone_future = executor.submit(
+            service.settings().get(setting='timezone').execute,
+            http=AuthorizedHttp(creds, http=build_http())
+        )
+
+        future = executor.submit(req.execute)
+        while future:
+            resp = future.result()
+            # Requesting next page
+            req = events_api.list_next(req, resp)
+            future = executor.submit(req.execute) if req else None
 
-    # Processing the API response and creating events
-    while req:
-        resp = req.execute()
-        with transaction.atomic():
-            for record in resp['items']:
-                create_event(record, user)
-        # Requesting next page
-        req = events_api.list_next(req, resp)
+            with transaction.atomic():
+                create_events(resp['items'], user, time_zone)
 
     # Setting up time zone for the user
-    req = service.settings().get(setting='timezone')
-    user_meta_data.time_zone = req.execute()['value']
-    user_meta_data.save()
\ No newline at end of file
+    user_meta_data.time_zone = time_zone_future.result()['value']
+    user_meta_data.synced_at = timezone.now()
+    user_meta_data.save()
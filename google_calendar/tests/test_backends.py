@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from google_calendar.backends import UserMetaDataBackend
+from google_calendar.models import UserMetaData
+
+
+class TestUserMetaDataBackend(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test_user')
+        self.user_meta_data = UserMetaData.objects.create(
+            user=self.user,
+            refresh_token='XXX',
+            access_token='XXX',
+            time_zone='Asia/Kolkata'
+        )
+
+    def test_get_user(self):
+        """
+        Tests user is loaded along with its meta data in a single query
+        """
+        backend = UserMetaDataBackend()
+        with self.assertNumQueries(1):
+            user = backend.get_user(self.user.pk)
+            self.assertEqual(user, self.user)
+            self.assertEqual(user.cal_meta_data.time_zone, 'Asia/Kolkata')
+
+        # Checking response for inactive and unknown users
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(backend.get_user(self.user.pk))
+        self.assertIsNone(backend.get_user(self.user.pk + 1))
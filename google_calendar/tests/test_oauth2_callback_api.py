@@ -0,0 +1,56 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from google_calendar.api import OAuth2CallBackAPI
+from google_calendar.backends import UserMetaDataBackend
+from google_calendar.models import UserMetaData
+
+
+class TestOAuth2CallBackAPI(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test_user')
+        self.user_meta_data = UserMetaData.objects.create(
+            user=self.user,
+            refresh_token='OLD',
+            access_token='OLD',
+            time_zone='Asia/Kolkata'
+        )
+
+    @mock.patch('google_calendar.api.scraper.store_events')
+    @mock.patch('google_calendar.api.google_auth_oauthlib.flow.Flow')
+    def test_get_reauthorized(self, mocked_flow, mocked_store_events):
+        """
+        Tests events are synced with the new credentials of an user who has
+        authorized again
+        """
+        flow = mocked_flow.from_client_secrets_file.return_value
+        flow.credentials.token = 'NEW'
+        flow.credentials.refresh_token = 'NEW'
+
+        def store_events(user):
+            # Scraper saves meta data of the user after syncing events
+            self.assertEqual(user.cal_meta_data.access_token, 'NEW')
+            self.assertEqual(user.cal_meta_data.refresh_token, 'NEW')
+            user.cal_meta_data.save()
+        mocked_store_events.side_effect = store_events
+
+        # User is loaded along with its meta data by the backend
+        user = UserMetaDataBackend().get_user(self.user.pk)
+        self.assertEqual(user.cal_meta_data.access_token, 'OLD')
+
+        request = APIRequestFactory().get(
+            reverse('google_calendar:oauth2_callback'), {'state': 'XXX'}
+        )
+        force_authenticate(request, user=user)
+        response = OAuth2CallBackAPI.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        mocked_store_events.assert_called_once_with(user)
+
+        self.user_meta_data.refresh_from_db()
+        self.assertEqual(self.user_meta_data.access_token, 'NEW')
+        self.assertEqual(self.user_meta_data.refresh_token, 'NEW')
@@ -1,44 +1,64 @@
-from datetime import timedelta, datetime
-from unittest import mock
-from unittest.mock import PropertyMock
+from datetime import timedelta, datetime, timezone
 
-import pandas as pd
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
 
-from google_calendar.api import ReportCalculator
-from google_calendar.models import UserMetaData
+from google_calendar import ACCEPTED, DECLINED
+from google_calendar.api import ReportAPI
+from google_calendar.models import UserMetaData, Event, Attendee
+from google_calendar.reports import ReportCalculator
 
 
-class TestReportCalculator(TestCase):
+# Aggregated events of months in 2019, in the same shape as
+# `ReportCalculator._monthly_events`, shared by the stats tests
+MONTHLY_EVENTS = tuple(
+    {'year': 2019, 'month': month, 'number_of_events': count,
+     'time_spent': hours * 3600}
+    for month, count, hours in sorted([(1, 5, 4), (11, 8, 1), (2, 10, 32),
+                                       (9, 15, 2), (7, 18, 9)])
+)
+
+
+def create_event(user, index, start_datetime, hours):
+    """
+    Creates an attended Event for the user
+    :param user: User instance
+    :param index: Index of the event used for its id and summary
+    :param start_datetime: datetime when event starts
+    :param hours: Duration of the event in hours
+    :return: Event instance
+    """
+    return Event.objects.create(
+        event_id=str(index),
+        user=user,
+        summary=f'Event {index}',
+        is_creator=True,
+        is_attendee=True,
+        start_datetime=start_datetime,
+        end_datetime=start_datetime + timedelta(hours=hours),
+        created_at=start_datetime
+    )
+
+
+class TestReportStats(SimpleTestCase):
 
     def setUp(self):
-        self.user = User.objects.create(username='test_user')
-        self.user_meta_data = UserMetaData.objects.create(
-            user=self.user,
-            refresh_token='XXX',
-            access_token='XXX',
-            time_zone='Asia/Kolkata'
-        )
+        # User is not saved as stats are calculated from aggregated events
+        # set on the calculator, so DB is not required
+        self.user = User(pk=1, username='test_user')
+        self.user.cal_meta_data = UserMetaData(time_zone='Asia/Kolkata')
 
-    @mock.patch('google_calendar.api.ReportCalculator._monthly_events_df',
-                new_callable=PropertyMock)
-    @mock.patch('google_calendar.api.ReportCalculator._number_of_weeks',
-                new_callable=PropertyMock)
-    def test_number_of_events(self, mocked_week_count, mocked_monthly_df):
+    def test_number_of_events(self):
         """
-        Tests calculated stats by mocking _monthly_events_df and _number_of_weeks
-        data frame
+        Tests calculated stats by setting _monthly_events and _number_of_weeks
         """
-        mocked_week_count.return_value = 48
-        df = pd.DataFrame({
-            'year': [2019] * 5,
-            'month': [1, 11, 2, 9, 7],
-            'number_of_events': [5, 8, 10, 15, 18]
-        })
-        df.sort_values(['year', 'month'], inplace=True)
-        mocked_monthly_df.return_value = df
         calc = ReportCalculator(self.user)
+        # Cached properties are assigned on the instance, so no query is made
+        calc._number_of_weeks = 48
+        calc._monthly_events = MONTHLY_EVENTS
         calc.last_3_month_date = datetime(2019, 9, 1)
 
         # Checking response
@@ -56,38 +76,13 @@ class TestReportCalculator(TestCase):
         ])
         self.assertEqual(result['weekly_average'], round(56/48, 2))
 
-        # Checking response when monthly data frame is empty
-        df = pd.DataFrame(
-            columns=['year', 'month', 'number_of_events']
-        )
-        df['number_of_events'] = df['number_of_events'].astype(int)
-        mocked_monthly_df.return_value = df
-        result_dict = calc.number_of_events()
-        self.assertEqual(result_dict['total'], 0)
-        self.assertEqual(result_dict['last_3_months'], [])
-        self.assertEqual(result_dict['most'], [])
-        self.assertEqual(result_dict['least'], [])
-        self.assertEqual(result_dict['weekly_average'], 0)
-
-    @mock.patch('google_calendar.api.ReportCalculator._monthly_events_df',
-                new_callable=PropertyMock)
-    @mock.patch('google_calendar.api.ReportCalculator._number_of_weeks',
-                new_callable=PropertyMock)
-    def test_time_spent(self, mocked_week_count, mocked_monthly_df):
+    def test_time_spent(self):
         """
-        Tests calculated stats by mocking _monthly_events_df and _number_of_weeks
+        Tests calculated stats by setting _monthly_events and _number_of_weeks
         """
-        mocked_week_count.return_value = 48
-        df = pd.DataFrame({
-            'year': [2019] * 5,
-            'month': [1, 11, 2, 9, 7],
-            'time_spent': [timedelta(hours=4), timedelta(hours=1),
-                           timedelta(hours=32), timedelta(hours=2),
-                           timedelta(hours=9)]
-        })
-        df.sort_values(['year', 'month'], inplace=True)
-        mocked_monthly_df.return_value = df
         calc = ReportCalculator(self.user)
+        calc._number_of_weeks = 48
+        calc._monthly_events = MONTHLY_EVENTS
         calc.last_3_month_date = datetime(2019, 9, 1)
 
         # Checking response
@@ -106,31 +101,108 @@ class TestReportCalculator(TestCase):
 
         self.assertEqual(result['weekly_average'], '0 days 01:00:00')
 
-        # Checking response when monthly data frame is empty
-        df = pd.DataFrame(
-            columns=['year', 'month', 'time_spent']
+        # Weekly average is still a duration when all the events are in the
+        # current week
+        calc._number_of_weeks = 0
+        self.assertEqual(calc.time_spent()['weekly_average'],
+                         '0 days 00:00:00')
+
+    def test_no_events(self):
+        """
+        Tests stats of the metrics when there are no monthly events
+        """
+        calc = ReportCalculator(self.user)
+        calc._monthly_events = ()
+        for metrics, zero_value in [('number_of_events', 0),
+                                    ('time_spent', '0 days 00:00:00')]:
+            with self.subTest(metrics=metrics):
+                self.assertEqual(getattr(calc, metrics)(), {
+                    'total': zero_value,
+                    'last_3_months': [],
+                    'most': [],
+                    'least': [],
+                    'weekly_average': zero_value
+                })
+
+    def test_last_3_months_across_years(self):
+        """
+        Tests last 3 months are calculated correctly when they span over two
+        years
+        """
+        calc = ReportCalculator(self.user)
+        calc._monthly_events = [
+            {'year': year, 'month': month, 'number_of_events': count}
+            for year, month, count in [(2019, 1, 4), (2019, 10, 5),
+                                       (2019, 11, 8), (2020, 1, 2)]
+        ]
+        calc.last_3_month_date = datetime(2019, 11, 1)
+
+        total, last_3_months = calc._calculate_total_and_last_3_months(
+            'number_of_events'
         )
-        df['time_spent'] = pd.to_timedelta(df['time_spent'])
-        mocked_monthly_df.return_value = df
-        result_dict = calc.time_spent()
-        self.assertEqual(result_dict['total'], '0 days 00:00:00')
-        self.assertEqual(result_dict['last_3_months'], [])
-        self.assertEqual(result_dict['most'], [])
-        self.assertEqual(result_dict['least'], [])
-        self.assertEqual(result_dict['weekly_average'], '0 days 00:00:00')
-
-    @mock.patch('google_calendar.api.ReportCalculator._attendees_counts',
-                new_callable=PropertyMock)
-    def test_attendee(self, mocked_attendees_count):
+        self.assertEqual(total, 19)
+        self.assertEqual(last_3_months, [
+            {'month': '2019-11', 'value': 8},
+            {'month': '2020-01', 'value': 2},
+        ])
+
+
+class TestReportCalculator(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Test cases only read the user, so it is created once for the class
+        cls.user = User.objects.create(username='test_user')
+        cls.user_meta_data = UserMetaData.objects.create(
+            user=cls.user,
+            refresh_token='XXX',
+            access_token='XXX',
+            time_zone='Asia/Kolkata'
+        )
+
+    def test_monthly_events(self):
+        """
+        Tests aggregation of events stored in the DB over localized months and
+        number of weeks derived from it
+        """
+        for i, (start_datetime, hours) in enumerate([
+            (datetime(2019, 1, 10, 10, tzinfo=timezone.utc), 2),
+            # Falls in February for `Asia/Kolkata`
+            (datetime(2019, 1, 31, 20, tzinfo=timezone.utc), 1),
+            (datetime(2019, 2, 5, 10, tzinfo=timezone.utc), 3),
+        ]):
+            create_event(self.user, i, start_datetime, hours)
+
+        calc = ReportCalculator(self.user)
+        calc._now = datetime(2019, 3, 14, 10, tzinfo=timezone.utc)
+        self.assertEqual(calc._monthly_events, (
+            {'year': 2019, 'month': 1, 'time_spent': 2 * 3600,
+             'number_of_events': 1,
+             'start': datetime(2019, 1, 10, 10, tzinfo=timezone.utc)},
+            {'year': 2019, 'month': 2, 'time_spent': 4 * 3600,
+             'number_of_events': 2,
+             'start': datetime(2019, 1, 31, 20, tzinfo=timezone.utc)},
+        ))
+        self.assertEqual(calc._number_of_weeks, 9)
+
+    def test_attendee(self):
         """
-        Tests calculated stats by mocking _attendees_counts
-        :return:
+        Tests calculated stats against events and attendees stored in the DB
         """
-        series = pd.Series(dict(
-            zip([ f'{i}@gmail.com' for i in 'abcdef'],
-                [11, 9, 7, 6, 5, 7])
+        attendee_counts = dict(zip(
+            [f'{i}@gmail.com' for i in 'abcdef'],
+            [11, 9, 7, 6, 5, 7]
         ))
-        mocked_attendees_count.return_value = series
+        start_datetime = datetime(2019, 11, 1, tzinfo=timezone.utc)
+        for i in range(max(attendee_counts.values())):
+            event = create_event(self.user, i, start_datetime, 1)
+            Attendee.objects.bulk_create([
+                Attendee(event=event, email=email, response=ACCEPTED)
+                for email, count in attendee_counts.items() if i < count
+            ])
+            # Declined attendees should not be counted
+            Attendee.objects.create(event=event, email='z@gmail.com',
+                                    response=DECLINED)
 
         # Checking response
         calc = ReportCalculator(self.user)
@@ -142,8 +214,57 @@ class TestReportCalculator(TestCase):
             {'name': 'f@gmail.com', 'number_of_events': 7}
         ])
 
-        # Checking response for empty series
-        mocked_attendees_count.return_value = pd.Series()
-        calc = ReportCalculator(self.user)
-        result_dict = calc.attendee()
-        self.assertEqual(result_dict['top_attendees'], [])
\ No newline at end of file
+        # Checking response when no event is matched, events are not
+        # aggregated for it
+        calc = ReportCalculator(self.user, summary__icontains='unknown')
+        with self.assertNumQueries(1):
+            result_dict = calc.attendee()
+        self.assertEqual(result_dict['top_attendees'], [])
+
+        # Attendees are not queried while computing reports without events
+        calc._monthly_events = ()
+        with self.assertNumQueries(0):
+            result_dict = calc.compute()['attendee']
+        self.assertEqual(result_dict['top_attendees'], [])
+
+
+class TestReportAPI(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='test_user')
+        self.user_meta_data = UserMetaData.objects.create(
+            user=self.user,
+            refresh_token='XXX',
+            access_token='XXX',
+            time_zone='Asia/Kolkata'
+        )
+
+    def _get_report(self, **params):
+        request = APIRequestFactory().get(
+            reverse('google_calendar:report'), params
+        )
+        force_authenticate(request, user=self.user)
+        return ReportAPI.as_view()(request).data
+
+    def test_get_cached(self):
+        """
+        Tests report is cached till events of the user are synced again
+        """
+        result = self._get_report()
+        self.assertEqual(result['number_of_events']['total'], 0)
+
+        # Cached report is served without hitting the DB
+        create_event(self.user, 0, datetime(2019, 11, 1, tzinfo=timezone.utc), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._get_report(), result)
+
+        # Reports for different search terms are cached separately
+        result = self._get_report(search='Event 0')
+        self.assertEqual(result['number_of_events']['total'], 1)
+
+        # Syncing events invalidates cached reports
+        self.user_meta_data.synced_at = datetime.now(timezone.utc)
+        self.user_meta_data.save()
+        result = self._get_report()
+        self.assertEqual(result['number_of_events']['total'], 1)
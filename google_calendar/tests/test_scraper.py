@@ -1,8 +1,10 @@
-from datetime import datetime
+import json
+import tempfile
+from datetime import datetime, timezone
+from unittest import mock
 
-import pytz
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
 
 from google_calendar import scraper
 from google_calendar.models import UserMetaData, Event
@@ -56,23 +58,20 @@ class TestScraper(TestCase):
         self.assertEqual(created_event.creator_email, '')
         self.assertEqual(created_event.is_attendee, True)
         self.assertEqual(created_event.created_at,
-                         datetime(2019, 10, 14, 14, 58, 32, tzinfo=pytz.utc))
+                         datetime(2019, 10, 14, 14, 58, 32, tzinfo=timezone.utc))
         self.assertEqual(created_event.start_datetime,
-                         datetime(2019, 11, 15, 11, 30, tzinfo=pytz.utc))
+                         datetime(2019, 11, 15, 11, 30, tzinfo=timezone.utc))
         self.assertEqual(created_event.end_datetime,
-                         datetime(2019, 11, 15, 12, tzinfo=pytz.utc))
+                         datetime(2019, 11, 15, 12, tzinfo=timezone.utc))
 
-        attendee_qset = created_event.attendees.all()
-        expected_attendee_dict = {
-            'a@gmail.com': 'declined',
-            'b@gmail.com': 'accepted',
-            'c@kisanhub.com': 'needs_action'
-        }
-        self.assertEqual(set(attendee_qset.values_list('email', flat=True)),
-                         set(expected_attendee_dict.keys()))
-        for attendee in attendee_qset:
-            self.assertEqual(attendee.response,
-                             expected_attendee_dict[attendee.email])
+        attendees = created_event.attendees.order_by('email').values_list(
+            'email', 'response'
+        )
+        self.assertEqual(tuple(attendees), (
+            ('a@gmail.com', 'declined'),
+            ('b@gmail.com', 'accepted'),
+            ('c@kisanhub.com', 'needs_action')
+        ))
 
         created_event.delete()
 
@@ -88,3 +87,145 @@ class TestScraper(TestCase):
         self.assertEqual(created_event.creator_email,
                          event_record['creator']['email'])
 
+    def test_create_events(self):
+        """
+        Tests Events and their attendees are created in bulk irrespective of
+        number of records
+        """
+        records = [{
+            'id': str(i),
+            'status': 'confirmed',
+            'created': '2019-10-14T14:58:32.000Z',
+            'summary': f'Event {i}',
+            'creator': {'email': 'a@gmail.com'},
+            'start': {'dateTime': '2019-11-15T17:00:00+05:30'},
+            'end': {'dateTime': '2019-11-15T17:30:00+05:30'},
+            'attendees': [{'email': 'a@gmail.com',
+                           'responseStatus': 'accepted'},
+                          {'email': 'b@gmail.com',
+                           'responseStatus': 'declined'}]
+        } for i in range(5)]
+
+        # Inserting events, fetching their primary keys(sqlite can not return
+        # them from bulk insert) and inserting attendees
+        with self.assertNumQueries(3):
+            events = scraper.create_events(records, self.user)
+
+        self.assertEqual([event.event_id for event in events],
+                         [record['id'] for record in records])
+        self.assertEqual(
+            list(Event.objects.filter(user=self.user).order_by(
+                'event_id', 'attendees__email'
+            ).values_list('event_id', 'attendees__email',
+                          'attendees__response')),
+            [(str(i), email, response) for i in range(5)
+             for email, response in [('a@gmail.com', 'accepted'),
+                                     ('b@gmail.com', 'declined')]]
+        )
+
+    @mock.patch('google_calendar.scraper.get_client_config')
+    @mock.patch('google_calendar.scraper.build')
+    def test_store_events(self, mocked_build, mocked_client_config):
+        """
+        Tests events are replaced by the events fetched from all pages of the
+        API along with time zone of the user
+        """
+        def event_record(event_id, attendees):
+            return {
+                'id': event_id,
+                'status': 'confirmed',
+                'created': '2019-10-14T14:58:32.000Z',
+                'summary': f'Event {event_id}',
+                'creator': {'email': 'a@gmail.com'},
+                'start': {'date': '2019-11-15'},
+                'end': {'date': '2019-11-16'},
+                'attendees': attendees
+            }
+
+        # Existing events of the user should be deleted
+        scraper.create_event(event_record('old', []), self.user)
+
+        first_page, second_page = mock.Mock(), mock.Mock()
+        first_page.execute.return_value = {'items': [
+            event_record('1', [{'email': 'test_user@gmail.com', 'self': True,
+                                'responseStatus': 'accepted'},
+                               {'email': 'b@gmail.com',
+                                'responseStatus': 'accepted'}]),
+            dict(event_record('2', []), status='cancelled'),
+        ]}
+        second_page.execute.return_value = {'items': [
+            event_record('3', [{'email': 'b@gmail.com',
+                                'responseStatus': 'tentative'}])
+        ]}
+        mocked_client_config.return_value = {
+            'client_id': 'XXX',
+            'client_secret': 'XXX',
+            'token_uri': 'https://oauth2.googleapis.com/token'
+        }
+        service = mocked_build.return_value
+        events_api = service.events.return_value
+        events_api.list.return_value = first_page
+        events_api.list_next.side_effect = \
+            lambda req, resp: second_page if req is first_page else None
+        service.settings.return_value.get.return_value.execute.return_value = {
+            'value': 'Europe/London'
+        }
+
+        scraper.store_events(self.user)
+
+        # Discovery document is shared between the syncs
+        self.assertEqual(mocked_build.call_args[1]['cache'],
+                         scraper.discovery_cache)
+
+        events = Event.objects.filter(user=self.user).order_by('event_id')
+        self.assertEqual(
+            list(events.values_list('event_id', 'is_attendee')),
+            [('1', True), ('3', False)]
+        )
+        self.assertEqual(
+            list(events.values_list('attendees__email',
+                                    'attendees__response')),
+            [('b@gmail.com', 'accepted'), ('b@gmail.com', 'tentative')]
+        )
+        self.assertEqual(events[0].start_datetime,
+                         datetime(2019, 11, 14, 18, 30, tzinfo=timezone.utc))
+
+        self.user_meta_data.refresh_from_db()
+        self.assertEqual(self.user_meta_data.time_zone, 'Europe/London')
+        self.assertIsNotNone(self.user_meta_data.synced_at)
+
+
+class TestScraperUtils(SimpleTestCase):
+
+    def test_discovery_document_cache(self):
+        """
+        Tests discovery documents are stored and served by url
+        """
+        discovery_cache = scraper.DiscoveryDocumentCache()
+        url = 'https://www.googleapis.com/discovery/v1/apis/calendar/v3/rest'
+        self.assertIsNone(discovery_cache.get(url))
+
+        discovery_cache.set(url, '{"name": "calendar"}')
+        self.assertEqual(discovery_cache.get(url), '{"name": "calendar"}')
+        self.assertIsNone(discovery_cache.get(url + '?version=v2'))
+
+    def test_get_client_config(self):
+        """
+        Tests credentials of the client app are loaded from `GOOGLE_CRED_PATH`
+        once
+        """
+        client_config = {
+            'client_id': 'XXX',
+            'client_secret': 'XXX',
+            'token_uri': 'https://oauth2.googleapis.com/token'
+        }
+        scraper.get_client_config.cache_clear()
+        self.addCleanup(scraper.get_client_config.cache_clear)
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as fp:
+            json.dump({'installed': client_config}, fp)
+            fp.flush()
+            with override_settings(GOOGLE_CRED_PATH=fp.name):
+                self.assertEqual(scraper.get_client_config(), client_config)
+
+        # File is not read again once credentials are loaded
+        self.assertEqual(scraper.get_client_config(), client_config)
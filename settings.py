@@ -1,4 +1,3 @@
-import json
 import os
 import sys
 
@@ -69,16 +68,36 @@ WSGI_APPLICATION = 'wsgi.application'
 
 # Database
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'django_db',
-        'USER': os.environ.get('DATABASE_USER', 'admin'),
-        'PASSWORD': os.environ['DATABASE_PASSWORD'],
-        'HOST': os.environ.get('DATABASE_PORT', '127.0.0.1'),
-        'PORT': os.environ.get('DATABASE_PORT', 5432)
+# Using sqlite3(in-memory) if tests are running through manage.py, so that
+# Postgres is neither required nor accessed by the tests. pytest uses
+# `test_settings` instead
+if 'test' in sys.argv:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+            'TEST': {'NAME': ':memory:'}
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': 'django_db',
+            'USER': os.environ.get('DATABASE_USER', 'admin'),
+            'PASSWORD': os.environ['DATABASE_PASSWORD'],
+            'HOST': os.environ.get('DATABASE_PORT', '127.0.0.1'),
+            'PORT': os.environ.get('DATABASE_PORT', 5432)
+        }
+    }
+
+
+# Authentication backends
+AUTHENTICATION_BACKENDS = [
+    'google_calendar.backends.UserMetaDataBackend',
+    # Keeping default backend so that sessions created with it are still valid
+    'django.contrib.auth.backends.ModelBackend',
+]
 
 
 # Password validation
@@ -115,15 +134,14 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
-# Google client app credentials
+# Google client app credentials. File is read only when calendar API is
+# accessed, see `google_calendar.scraper.get_client_config`
 GOOGLE_CRED_PATH = os.environ.get('GOOGLE_CRED_PATH')
 
-with open(GOOGLE_CRED_PATH) as fp:
-    cred = json.load(fp)
 
-GOOGLE_CLIENT_ID = cred['installed']['client_id']
-GOOGLE_CLIENT_SECRET = cred['installed']['client_secret']
-GOOGLE_TOKEN_URI = cred['installed']['token_uri']
+# Seconds for which a report is cached. Reports depend on current time as well,
+# hence they are cached for a limited time even if events are not synced again
+REPORT_CACHE_TIMEOUT = 3600
 
 
 # OAuthToken
@@ -131,8 +149,3 @@ OAUTH2_PROVIDER = {
     'ACCESS_TOKEN_EXPIRE_SECONDS': 432000,
     'ROTATE_REFRESH_TOKEN': False
 }
-
-# Test settings
-# Using sqlite3(in-memory) is tests are running
-if 'test' in sys.argv:
-    DATABASES['default'] = {'ENGINE': 'django.db.backends.sqlite3'}
\ No newline at end of file
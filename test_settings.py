@@ -0,0 +1,18 @@
+"""
+Settings used by pytest, see pytest.ini
+"""
+import os
+
+# Postgres is not accessed by the tests, so its password is not required
+os.environ.setdefault('DATABASE_PASSWORD', '')
+
+from settings import *  # noqa: E402,F401,F403
+
+# Using sqlite3(in-memory) for the tests
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+        'TEST': {'NAME': ':memory:'}
+    }
+}